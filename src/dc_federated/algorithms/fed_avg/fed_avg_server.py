@@ -13,6 +13,7 @@ from dc_federated.backend import DCFServer, \
 
 from dc_federated.backend._constants import *
 from dc_federated.algorithms.fed_avg.fed_avg_model_trainer import FedAvgModelTrainer
+from dc_federated.algorithms.fed_avg.fed_avg_utils import resolve_wire_dtype, cast_parameters
 
 import logging
 
@@ -56,6 +57,14 @@ class FedAvgServer(object):
     ssl_certfile: str
         Must be a valid path to the certificate.
         This is mandatory if ssl_enabled is True, ignored otherwise.
+
+    wire_dtype: str (default None)
+        If given (e.g. 'float16'), the float32 parameters of the global model
+        are converted to this torch dtype before being sent to the workers,
+        reducing the size of the transmitted model. Buffers, such as batchnorm
+        statistics, are always sent at full precision. The workers cast the
+        parameters back when loading the model state dict. Must name a
+        floating point dtype, otherwise a ValueError is raised.
     """
 
     def __init__(self,
@@ -66,13 +75,15 @@ class FedAvgServer(object):
                  server_port=8080,
                  ssl_enabled=False,
                  ssl_keyfile=None,
-                 ssl_certfile=None):
+                 ssl_certfile=None,
+                 wire_dtype=None):
         logger.info(
             f"Initializing FedAvg server for model class {global_model_trainer.get_model().__class__.__name__}")
 
         self.worker_updates = {}
         self.global_model_trainer = global_model_trainer
         self.update_lim = update_lim
+        self.wire_dtype = resolve_wire_dtype(wire_dtype)
 
         self.last_global_model_update_timestamp = datetime(1980, 10, 10)
         self.server = DCFServer(
@@ -95,6 +106,8 @@ class FedAvgServer(object):
         self.unique_updates_since_last_agg = 0
         self.iteration = 0
         self.model_version = 0
+        # (model version, serialized global model)
+        self._serialized_global_model = (None, None)
 
     def register_worker(self, worker_id):
         """
@@ -135,11 +148,21 @@ class FedAvgServer(object):
             GLOBAL_MODEL: serialized global model.
             GLOBAL_MODEL_VERSION: version of the global model
         """
-        model_data = io.BytesIO()
-        torch.save(self.global_model_trainer.get_model(), model_data)
+        # the global model only changes with the model version, so it is
+        # serialized once per version rather than on every request.
+        version, model_serialized = self._serialized_global_model
+        if version != self.model_version:
+            model = self.global_model_trainer.get_model()
+            if self.wire_dtype is not None:
+                model = cast_parameters(model, self.wire_dtype)
+
+            model_data = io.BytesIO()
+            torch.save(model, model_data)
+            model_serialized = model_data.getvalue()
+            self._serialized_global_model = (self.model_version, model_serialized)
 
         return {
-            GLOBAL_MODEL: model_data.getvalue(),
+            GLOBAL_MODEL: model_serialized,
             GLOBAL_MODEL_VERSION: self.model_version
         }
 
@@ -204,10 +227,15 @@ class FedAvgServer(object):
 
         logger.info("Updating the global model.\n")
 
+        # workers may send their parameters at a reduced precision, so
+        # aggregate them at the precision of the global model.
+        global_state_dict = self.global_model_trainer.get_model().state_dict()
+
         def agg_params(key, state_dicts, update_sizes):
-            agg_val = state_dicts[0][key] * update_sizes[0]
+            dtype = global_state_dict[key].dtype
+            agg_val = state_dicts[0][key].to(dtype) * update_sizes[0]
             for sd, sz in zip(state_dicts[1:], update_sizes[1:]):
-                agg_val = agg_val + sd[key] * sz
+                agg_val = agg_val + sd[key].to(dtype) * sz
             agg_val = agg_val / sum(update_sizes)
             return torch.tensor(agg_val.cpu().clone().numpy())
 
@@ -234,6 +262,7 @@ class FedAvgServer(object):
         self.unique_updates_since_last_agg = 0
         self.iteration += 1
         self.model_version += 1
+        self.server.notify_new_global_model()
 
         return True
 
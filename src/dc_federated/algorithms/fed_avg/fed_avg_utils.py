@@ -0,0 +1,59 @@
+"""
+Helpers shared by the server and worker sides of the FedAvg algorithm.
+"""
+
+import copy
+
+import torch
+
+
+def resolve_wire_dtype(wire_dtype):
+    """
+    Returns the torch dtype named by wire_dtype, checking that it can hold
+    model parameters.
+
+    Parameters
+    ----------
+
+    wire_dtype: str
+        The name of a floating point torch dtype, e.g. 'float16', or None.
+
+    Returns
+    -------
+
+    torch.dtype:
+        The dtype, or None if wire_dtype is None.
+    """
+    if wire_dtype is None:
+        return None
+    dtype = getattr(torch, wire_dtype, None)
+    if not isinstance(dtype, torch.dtype) or not dtype.is_floating_point:
+        raise ValueError(f"wire_dtype must be a floating point torch dtype, got {wire_dtype!r}.")
+    return dtype
+
+
+def cast_parameters(model, dtype):
+    """
+    Returns a copy of the model with its float32 parameters cast to dtype.
+    Buffers, such as batchnorm statistics, are left at full precision.
+
+    Parameters
+    ----------
+
+    model: torch.nn.Module
+        The model to cast - it is not modified.
+
+    dtype: torch.dtype
+        The floating point dtype to cast the parameters to.
+
+    Returns
+    -------
+
+    torch.nn.Module:
+        The cast copy of the model.
+    """
+    model = copy.deepcopy(model)
+    for param in model.parameters():
+        if param.dtype == torch.float32:
+            param.data = param.data.to(dtype)
+    return model
@@ -13,6 +13,7 @@ import torch
 from dc_federated.utils import get_host_ip
 from dc_federated.backend import GLOBAL_MODEL, GLOBAL_MODEL_VERSION, WID_LEN
 from dc_federated.backend import DCFWorker
+from dc_federated.algorithms.fed_avg.fed_avg_utils import resolve_wire_dtype, cast_parameters
 
 
 logger = logging.getLogger(__name__)
@@ -39,10 +40,17 @@ class FedAvgWorker(object):
 
     server_port: int
         The port at which the serer should listen to
+
+    wire_dtype: str (default None)
+        If given, the floating point torch dtype (e.g. 'float16') that the
+        float32 parameters of the model update are sent in. The server casts
+        them back to the dtype of the global model when aggregating.
     """
 
-    def __init__(self, fed_model_trainer, private_key_file, server_protocol=None, server_host_ip=None, server_port=None):
+    def __init__(self, fed_model_trainer, private_key_file, server_protocol=None, server_host_ip=None, server_port=None,
+                 wire_dtype=None):
         self.fed_model = fed_model_trainer
+        self.wire_dtype = resolve_wire_dtype(wire_dtype)
 
         server_protocol = 'http' if server_protocol is None else 'https'
         server_host_ip = get_host_ip() if not server_host_ip else server_host_ip
@@ -75,8 +83,12 @@ class FedAvgWorker(object):
         byte-string:
             A serialized version of the model.
         """
+        model = self.fed_model.get_model()
+        if self.wire_dtype is not None:
+            model = cast_parameters(model, self.wire_dtype)
+
         model_data = io.BytesIO()
-        torch.save(self.fed_model.get_model(), model_data)
+        torch.save(model, model_data)
         return model_data.getvalue()
 
     def train_and_test_model(self):
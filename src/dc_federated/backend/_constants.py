@@ -24,14 +24,32 @@ INVALID_WORKER = "Invalid Worker"
 UNREGISTERED_WORKER = 'Unregistered Worker'
 
 PUBLIC_KEY_STR = 'public_key_str'
+PUBLIC_KEY_HEX_LEN = 64
 SIGNED_PHRASE = 'signed_phrase'
 
 REGISTRATION_STATUS_KEY = 'registered'
 
+COMPRESSION_HEADER = 'X-Compression'
+ZLIB_COMPRESSION = 'zlib'
+ZSTD_COMPRESSION = 'zstd'
+MODEL_UPDATE_CHUNK_SIZE = 64 * 1024
+# limits on the size of a worker's model update, as uploaded (compressed) and
+# once decompressed.
+MAX_UPLOAD_SIZE = 512 * 1024 ** 2
+MAX_DECOMPRESSED_UPDATE_SIZE = 1024 ** 3
+
 ADMIN_PASSWORD = 'DCF_SERVER_ADMIN_PASSWORD'
 ADMIN_USERNAME = 'DCF_SERVER_ADMIN_USERNAME'
 
+MAX_GREENLETS = 'DCF_SERVER_MAX_GREENLETS'
+DEFAULT_MAX_GREENLETS = 1000
+SERVER_BUSY = 'Server Busy'
+SERVER_BUSY_RETRY_AFTER = 5
+
 ERROR_MESSAGE_KEY = 'error'
 SUCCESS_MESSAGE_KEY = 'success'
 
 WID_LEN = 8
+
+VERIFIED_SIGNATURES_CACHE_SIZE = 4096
+VERIFY_KEY_CACHE_SIZE = 8192
@@ -5,25 +5,64 @@ import os
 import hashlib
 import time
 import json
+import secrets
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
 
 from dc_federated.backend._constants import INVALID_WORKER, WORKER_ID_KEY, \
-    REGISTRATION_STATUS_KEY, PUBLIC_KEY_STR, WID_LEN
+    REGISTRATION_STATUS_KEY, PUBLIC_KEY_STR, PUBLIC_KEY_HEX_LEN, WID_LEN, \
+    VERIFIED_SIGNATURES_CACHE_SIZE, VERIFY_KEY_CACHE_SIZE, AUTHENTICATED, UNREGISTERED_WORKER
 from dc_federated.backend.backend_utils import message_seriously_wrong
-from nacl.encoding import HexEncoder
 from nacl.exceptions import BadSignatureError
 from nacl.signing import VerifyKey
 
-from tinydb import TinyDB, Query
-
 import logging
 
 logger = logging.getLogger(__name__)
 logger.setLevel(level=logging.INFO)
 
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+@lru_cache(maxsize=VERIFY_KEY_CACHE_SIZE)
+def _make_verify_key(public_key):
+    """
+    Creates the VerifyKey for the given raw public key, memoized so that
+    keys that are added again are not decoded a second time.
+
+    Parameters
+    ----------
+
+    public_key: bytes
+        The raw 32 byte public key.
+
+    Returns
+    -------
+
+    VerifyKey:
+        The key to verify signatures with.
+    """
+    return VerifyKey(public_key)
+
+
+def _synchronized(method):
+    """
+    Decorator for WorkerManager methods that change its state, so that
+    they hold the manager's lock while they run.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class WorkerManager(object):
     """
-    Manages workers. It maintains a list of allowed workers and registered workers
+    Manages workers. It maintains a set of allowed workers and registered workers
     and provides an interface for adding, removing, registering and authenticating them.
 
     Parameters
@@ -42,8 +81,8 @@ class WorkerManager(object):
         worker_key_pair_tool tool.
 
     load_last_session_workers: bool
-        When running in safe mode, whether or not to load the workers from the
-        previous session.
+        When running in safe mode, whether or not to load the workers, and
+        their registration status, from the previous session.
 
     path_to_keys_db: str
         Path to the database of workers' public keys.
@@ -53,12 +92,28 @@ class WorkerManager(object):
                  key_list_file,
                  load_last_session_workers=True,
                  path_to_keys_db='.keys_db.json'):
+        # guards the worker state and the keys database against concurrent
+        # changes. authenticate_worker does not take it, as it only reads the
+        # worker state and tolerates concurrent evictions from its cache of
+        # verified signatures.
+        self._lock = threading.RLock()
+
+        # maps the hex encoded public keys, as used for the worker ids, to the
+        # corresponding VerifyKey so that authentication does not decode the key each time.
         self.public_keys = {}
-        self.allowed_workers = []
+        self.allowed_workers = set()
         self.registered_workers = {}
         self.public_keys_db = None
         self.challenge_phrases = {}
 
+        # serialized version of registered_workers, rebuilt lazily after any change.
+        self._worker_list = None
+
+        # LRU cache of signatures that have already been verified, mapping a
+        # digest of the signed message keyed with the raw public key to
+        # (public key, message).
+        self.verified_signatures = OrderedDict()
+
         if not server_mode_safe:
             if key_list_file is not None:
                 error_str = "Server started in unsafe mode but list of public keys provided. "\
@@ -76,24 +131,45 @@ class WorkerManager(object):
         self.do_public_key_auth = True
         self.public_keys_db = None
 
-        keys_to_load = []
+        # maps each public key to its registration status.
+        keys_to_load = {}
         if load_last_session_workers:
             keys_to_load = self.init_db(path_to_keys_db)
 
         if key_list_file is not None:
-            with open(key_list_file, 'r') as f:
-                keys = f.read().splitlines()
-                keys_to_load.extend(keys)
-
-        for key in set(keys_to_load):
-            _, success = self.add_worker(key)
-            if not success:
-                logger.warning(f"Invalid public key {key} - worker not added.")
+            # stream the file rather than reading it whole - public keys are
+            # hex strings, so each non-empty line is decoded as ascii.
+            with open(key_list_file, 'rb') as f:
+                for line in f:
+                    key = line.strip()
+                    if key:
+                        keys_to_load.setdefault(key.decode('ascii', 'replace'), False)
+
+        added_keys = []
+        for key, registered in keys_to_load.items():
+            worker_id, success = self.add_worker(key, persist=False)
+            if success:
+                added_keys.append((key, int(registered)))
+                self.registered_workers[worker_id] = registered
+            else:
+                logger.warning("Invalid public key %s - worker not added.", key)
+
+        # write all the initial keys to the database in a single transaction.
+        if self.public_keys_db is not None:
+            self.public_keys_db.execute("BEGIN")
+            try:
+                self.public_keys_db.executemany(
+                    "INSERT OR IGNORE INTO keys VALUES(?, ?)", added_keys)
+            except Exception:
+                # leave the connection in autocommit mode for later writes.
+                self.public_keys_db.execute("ROLLBACK")
+                raise
+            self.public_keys_db.execute("COMMIT")
 
     def init_db(self, path_to_keys_db):
         """
         Initialize the database of public_keys from the existing database,
-        if any, and return the list of keys.
+        if any, and return the keys with their registration status.
 
         Parameters
         ----------
@@ -104,27 +180,51 @@ class WorkerManager(object):
         Returns
         -------
 
-        list:
-            The list of keys found
+        dict:
+            The keys found, mapped to whether or not the worker was registered.
         """
+        keys_to_load = {}
         if not os.path.exists(path_to_keys_db):
-            logger.warning(f"Unable to locate workers database at {path_to_keys_db} - "
-                           f"creating new database.")
+            logger.warning("Unable to locate workers database at %s - "
+                           "creating new database.", path_to_keys_db)
         else:
             logger.info("Creating a backup keys database...")
-            with open(path_to_keys_db, 'r') as f:
-                data = json.load(f)
-            with open(path_to_keys_db + '.bak', 'w') as f:
-                json.dump(data, f)
-
-            logger.info(f"Backup written to {path_to_keys_db + '.bak'}.")
-
-        self.public_keys_db = TinyDB(path_to_keys_db)
-        docs = self.public_keys_db.all()
-        keys_to_load = [doc[PUBLIC_KEY_STR] for doc in docs]
+            if os.path.exists(path_to_keys_db + '.bak'):
+                os.remove(path_to_keys_db + '.bak')
+            with open(path_to_keys_db, 'rb') as f:
+                is_legacy_db = f.read(len(SQLITE_HEADER)) not in (SQLITE_HEADER, b'')
+            if is_legacy_db:
+                # databases from earlier versions were TinyDB json documents.
+                shutil.copyfile(path_to_keys_db, path_to_keys_db + '.bak')
+                with open(path_to_keys_db, 'r') as f:
+                    data = json.load(f)
+                keys_to_load = {doc[PUBLIC_KEY_STR]: False for doc in data.get('_default', {}).values()}
+                os.remove(path_to_keys_db)
+                logger.info("Migrating %d keys from the legacy json database.", len(keys_to_load))
+            else:
+                db = sqlite3.connect(path_to_keys_db)
+                backup_db = sqlite3.connect(path_to_keys_db + '.bak')
+                db.backup(backup_db)
+                backup_db.close()
+                db.close()
+
+            logger.info("Backup written to %s.", path_to_keys_db + '.bak')
+
+        self.public_keys_db = sqlite3.connect(path_to_keys_db, isolation_level=None,
+                                              check_same_thread=False)
+        self.public_keys_db.execute("PRAGMA journal_mode=WAL")
+        self.public_keys_db.execute("PRAGMA synchronous=NORMAL")
+        self.public_keys_db.execute("CREATE TABLE IF NOT EXISTS keys("
+                                    "pk TEXT PRIMARY KEY, registered INTEGER NOT NULL DEFAULT 0)")
+        columns = [column[1] for column in self.public_keys_db.execute("PRAGMA table_info(keys)")]
+        if 'registered' not in columns:
+            self.public_keys_db.execute(
+                "ALTER TABLE keys ADD COLUMN registered INTEGER NOT NULL DEFAULT 0")
+        for pk, registered in self.public_keys_db.execute("SELECT pk, registered FROM keys"):
+            keys_to_load[pk] = bool(registered)
 
         # purge db because all the keys will be added later.
-        self.public_keys_db.remove(doc_ids=[doc.doc_id for doc in docs])
+        self.public_keys_db.execute("DELETE FROM keys")
 
         return keys_to_load
 
@@ -152,7 +252,8 @@ class WorkerManager(object):
         else:
             return INVALID_WORKER, False
 
-    def add_worker(self, public_key_str):
+    @_synchronized
+    def add_worker(self, public_key_str, persist=True):
         """
         Adds the worker with the given public key to the list of allowed workers.
         Adds the public key of the worker to the set of public keys if necessary.
@@ -163,6 +264,9 @@ class WorkerManager(object):
         public_key_str: str
             The public key
 
+        persist: bool (default True)
+            Whether or not to write the public key to the keys database.
+
         Returns
         -------
 
@@ -171,11 +275,12 @@ class WorkerManager(object):
         """
         if self.do_public_key_auth:
             if not self.add_public_key(public_key_str):
-                logger.warning(f"Invalid public key (short) {public_key_str[0:WID_LEN]} - worker not added")
+                logger.warning("Invalid public key (short) %s - worker not added", public_key_str[0:WID_LEN])
                 return INVALID_WORKER, False
-        return self._add_worker(public_key_str)
+        return self._add_worker(public_key_str, persist)
 
-    def _add_worker(self, public_key_str):
+    @_synchronized
+    def _add_worker(self, public_key_str, persist=True):
         """
         Internal function for adding worker to the list of allowed workers.
         Assumes the public key was added prior to calling this function.
@@ -186,6 +291,9 @@ class WorkerManager(object):
         public_key_str: str
             The public key
 
+        persist: bool (default True)
+            Whether or not to write the public key to the keys database.
+
         Returns
         -------
 
@@ -193,23 +301,24 @@ class WorkerManager(object):
             The worker id and whether or not the operation was successful.
         """
         worker_id = self.generate_id_for_worker(public_key_str)
-        if self.do_public_key_auth and public_key_str not in self.public_keys:
+        if self.do_public_key_auth and self.public_keys.get(public_key_str) is None:
             err = message_seriously_wrong("trying to add worker without first adding its public key")
             logger.error(err)
             return err, False
         if worker_id not in self.allowed_workers:
-            self.allowed_workers.append(worker_id)
+            self.allowed_workers.add(worker_id)
             self.registered_workers[worker_id] = False
-            if self.public_keys_db is not None:
-                    self.public_keys_db.insert({PUBLIC_KEY_STR: public_key_str})
-            logger.info(
-                f"Successfully added worker with public key (short) {public_key_str[0:WID_LEN]}")
+            self._worker_list = None
+            if persist and self.public_keys_db is not None:
+                self.public_keys_db.execute("INSERT OR IGNORE INTO keys VALUES(?, 0)", (public_key_str,))
+            logger.info("Successfully added worker with public key (short) %s", public_key_str[0:WID_LEN])
             return worker_id, True
         else:
-            logger.info(f"Worker with public key (short) {public_key_str[0:WID_LEN]} was added previously "
-                        "- no additional actions taken.")
+            logger.debug("Worker with public key (short) %s was added previously "
+                         "- no additional actions taken.", public_key_str[0:WID_LEN])
             return worker_id, False
 
+    @_synchronized
     def set_registration_status(self, worker_id, should_register):
         """
         Sets the registration status of the given worker to the given value.
@@ -232,13 +341,19 @@ class WorkerManager(object):
         if worker_id in self.allowed_workers:
             old_status = self.registered_workers[worker_id]
             self.registered_workers[worker_id] = should_register
-            logger.info(f"Set registration status of worker {worker_id[0:WID_LEN]} from {old_status} to {should_register}.")
+            self._worker_list = None
+            if self.public_keys_db is not None:
+                self.public_keys_db.execute("UPDATE keys SET registered=? WHERE pk=?",
+                                            (int(should_register), worker_id))
+            logger.info("Set registration status of worker %s from %s to %s.",
+                        worker_id[0:WID_LEN], old_status, should_register)
             return worker_id
         else:
-            logger.warning(
-                f"Please add worker with public key {worker_id[0:WID_LEN]} before trying to change registration status.")
+            logger.warning("Please add worker with public key %s before trying to change registration status.",
+                           worker_id[0:WID_LEN])
             return INVALID_WORKER
 
+    @_synchronized
     def remove_worker(self, worker_id):
         """
         Removes the worker from the set of allowed workers.
@@ -257,21 +372,22 @@ class WorkerManager(object):
         """
         if worker_id in self.allowed_workers:
             self.allowed_workers.remove(worker_id)
+            self._worker_list = None
             self.delete_public_key(worker_id)
             if self.public_keys_db is not None:
-                doc_ids = [doc.doc_id
-                           for doc in self.public_keys_db.search(Query()[PUBLIC_KEY_STR] == worker_id)]
-                if len(doc_ids) == 0:
-                    logger.error(f"Worker {worker_id[0:WID_LEN]} not found in workers_db!!!")
-                self.public_keys_db.remove(doc_ids=doc_ids)
-
-            logger.info(f"Worker {worker_id[0:WID_LEN]} was removed - this worker will "
-                        f"no longer be allowed to register or participate in federated learning. ")
+                cursor = self.public_keys_db.execute("DELETE FROM keys WHERE pk=?", (worker_id,))
+                if cursor.rowcount == 0:
+                    logger.error("Worker %s not found in workers_db!!!", worker_id[0:WID_LEN])
+
+            logger.info("Worker %s was removed - this worker will "
+                        "no longer be allowed to register or participate in federated learning. ",
+                        worker_id[0:WID_LEN])
             return worker_id
         else:
-            logger.warning(f"Attempt to remove non-existent worker {worker_id[0:WID_LEN]}.")
+            logger.warning("Attempt to remove non-existent worker %s.", worker_id[0:WID_LEN])
             return INVALID_WORKER
 
+    @_synchronized
     def add_public_key(self, public_key_str):
         """
         Checks that the supplied public key is a valid public key, and
@@ -292,17 +408,23 @@ class WorkerManager(object):
         """
         if not self.do_public_key_auth:
             return True
+        # ed25519 public keys are always 32 bytes, so reject anything else
+        # before trying to decode it.
+        if len(public_key_str) != PUBLIC_KEY_HEX_LEN:
+            logger.warning("Invalid public key (short) %s - expected %d hex characters.",
+                           public_key_str[0:WID_LEN], PUBLIC_KEY_HEX_LEN)
+            return False
+        if public_key_str in self.public_keys:
+            logger.warning("Attempt to add previously added public key (short) %s.", public_key_str[0:WID_LEN])
+            return True
         try:
-            if public_key_str not in self.public_keys:
-                self.public_keys[public_key_str] = VerifyKey(public_key_str.encode(), encoder=HexEncoder)
-                return True
-            else:
-                logger.warning(f"Attempt to add previously added public key (short) {public_key_str[0:WID_LEN]}.")
-                return True
+            self.public_keys[public_key_str] = _make_verify_key(bytes.fromhex(public_key_str))
+            return True
         except Exception as e:
             logger.warning(e)
             return False
 
+    @_synchronized
     def delete_public_key(self, public_key_str):
         """
         Removes the public key from the internal dictionary of public keys.
@@ -318,20 +440,14 @@ class WorkerManager(object):
 
         bool:
             True if the public key was removed or if it was not in the list to begin with.
-            False otherwise. 
         """
         if not self.do_public_key_auth:
             return True
-        try:
-            if public_key_str in self.public_keys:
-                del self.public_keys[public_key_str]
-                return True
-            else:
-                logger.warning(f"Attempt to remove unknown public key (short) {public_key_str[0:WID_LEN]}.")
-                return True
-        except Exception as e:
-            logger.warning(e)
-            return False
+        if self.public_keys.pop(public_key_str, None) is not None:
+            self._forget_verified_signatures(public_key_str)
+        else:
+            logger.warning("Attempt to remove unknown public key (short) %s.", public_key_str[0:WID_LEN])
+        return True
 
     def get_keys(self):
         """
@@ -343,7 +459,7 @@ class WorkerManager(object):
         list of str:
             The set of public keys for the clients.
         """
-        return list(self.public_keys.keys())
+        return list(self.public_keys)
 
     def generate_id_for_worker(self, public_key_str):
         """
@@ -367,9 +483,9 @@ class WorkerManager(object):
         if self.do_public_key_auth:
             return public_key_str
         else:
-            return hashlib.sha224(str(time.time()).encode(
-                    'utf-8')).hexdigest() + '_unauthenticated'
+            return secrets.token_hex(28) + '_unauthenticated'
 
+    @_synchronized
     def get_challenge_phrase(self, worker_id):
         """
         Returns a challenge phrase for the worker to sign using
@@ -392,6 +508,7 @@ class WorkerManager(object):
             hashlib.sha224(str(time.time()).encode('utf-8')).hexdigest()
         return self.challenge_phrases[worker_id]
 
+    @_synchronized
     def verify_challenge(self, worker_id, signed_challenge):
         """
         Verifies that the signed_challenge was signed by worker with id
@@ -415,10 +532,10 @@ class WorkerManager(object):
         if not self.do_public_key_auth:
             return True
         if worker_id not in self.challenge_phrases:
-            logger.error(f"Worker id {worker_id[0:WID_LEN]} not found in challenge phrases")
+            logger.error("Worker id %s not found in challenge phrases", worker_id[0:WID_LEN])
             return False
         if self.challenge_phrases[worker_id] is None:
-            logger.error(f"Challenge phrase for worker id {worker_id[0:WID_LEN]} is None")
+            logger.error("Challenge phrase for worker id %s is None", worker_id[0:WID_LEN])
             return False
 
         success = self.authenticate_worker(
@@ -427,6 +544,41 @@ class WorkerManager(object):
 
         return success
 
+    @_synchronized
+    def check_polling_auth(self, worker_id, signed_challenge):
+        """
+        Runs all the checks needed before serving a worker's global model
+        request under a single acquisition of the lock: the worker must be
+        allowed, must have signed its challenge phrase and must be registered.
+
+        Parameters
+        ----------
+
+        worker_id: str
+            The id of the worker making the request.
+
+        signed_challenge: str
+            UTF-8 encoded signed challenge phrase.
+
+        Returns
+        -------
+
+        str:
+            AUTHENTICATED if all the checks pass, UNREGISTERED_WORKER if the
+            worker is authenticated but not registered and INVALID_WORKER
+            otherwise.
+        """
+        if worker_id not in self.allowed_workers:
+            logger.warning("Unknown worker %s tried to get the global model.", worker_id[0:WID_LEN])
+            return INVALID_WORKER
+        if not self.verify_challenge(worker_id, signed_challenge):
+            logger.error("Failed to verify worker with id %s", worker_id[0:WID_LEN])
+            return INVALID_WORKER
+        if not self.registered_workers.get(worker_id, False):
+            logger.warning("Unregistered worker %s tried to get the global model.", worker_id[0:WID_LEN])
+            return UNREGISTERED_WORKER
+        return AUTHENTICATED
+
     def authenticate_worker(self, public_key_str, signed_message, message_to_check=None):
         """
         Authenticates a worker with the given public key against the
@@ -453,34 +605,87 @@ class WorkerManager(object):
         if not self.do_public_key_auth:
             logger.warning("Accepting worker as valid without authentication.")
             return True
+        verify_key = self.public_keys.get(public_key_str)
+        if verify_key is None:
+            logger.error("Unknown public key (short) %s.", public_key_str[0:WID_LEN])
+            return False
         try:
-            if public_key_str not in self.public_keys:
-                logger.error(f"Unknown public key (short) {public_key_str[0:WID_LEN]}.")
-                return False
-            v = self.public_keys[public_key_str].verify(
-                signed_message.encode(), encoder=HexEncoder)
-            if message_to_check is not None:
-                if v != message_to_check:
-                    logger.error(f"Message {message_to_check} does not match decrypted message {v}")
-                    return False
-                else:
-                    return True
-
+            # decode the signed message once - the raw bytes are used for both
+            # the cache lookup, keyed with the public key, and the verification.
+            signed = bytes.fromhex(signed_message)
+            cache_key = hashlib.blake2b(signed, digest_size=16, key=bytes(verify_key)).digest()
+            cached = self.verified_signatures.get(cache_key)
+            if cached is not None:
+                try:
+                    self.verified_signatures.move_to_end(cache_key)
+                except KeyError:
+                    # evicted by another thread since the get - the cached
+                    # value is still a valid verification.
+                    pass
+                v = cached[1]
+            else:
+                v = verify_key.verify(signed)
+                self._cache_verified_signature(cache_key, public_key_str, v)
         except BadSignatureError:
-            logger.warning(
-                f"Failed to authenticate worker with public key (short) {public_key_str[0:WID_LEN]}.")
+            logger.warning("Failed to authenticate worker with public key (short) %s.", public_key_str[0:WID_LEN])
             return False
         except Exception as e:
-            logger.error(f"Exception when trying to authenticate worker {str(e)}")
+            logger.error("Exception when trying to authenticate worker %s", e)
             return False
-        else:
-            logger.info(
-                f"Successfully authenticated worker with public key (short) {public_key_str[0:WID_LEN]}.")
-            return True
 
+        if message_to_check is not None:
+            if v != message_to_check:
+                logger.error("Message %s does not match decrypted message %s", message_to_check, v)
+                return False
+            else:
+                return True
+
+        logger.debug("Successfully authenticated worker with public key (short) %s.", public_key_str[0:WID_LEN])
+        return True
+
+    def _cache_verified_signature(self, cache_key, public_key_str, message):
+        """
+        Adds a successfully verified signature to the cache of verified
+        signatures, evicting the least recently used entry if the cache is full.
+
+        Parameters
+        ----------
+
+        cache_key: bytes
+            Digest of the signed message keyed with the public key.
+
+        public_key_str: str
+            UFT-8 encoded version of the public key
+
+        message: bytes
+            The message recovered from the signed message.
+        """
+        self.verified_signatures[cache_key] = (public_key_str, message)
+        if len(self.verified_signatures) > VERIFIED_SIGNATURES_CACHE_SIZE:
+            self.verified_signatures.popitem(last=False)
+
+    def _forget_verified_signatures(self, public_key_str):
+        """
+        Removes all cached verified signatures for the given public key.
+
+        Parameters
+        ----------
+
+        public_key_str: str
+            UFT-8 encoded version of the public key
+        """
+        stale_keys = [cache_key for cache_key, (key, _) in list(self.verified_signatures.items())
+                      if key == public_key_str]
+        for cache_key in stale_keys:
+            # may have been evicted by a concurrent authenticate_worker since the snapshot.
+            self.verified_signatures.pop(cache_key, None)
+
+    @_synchronized
     def get_worker_list(self):
         """
-        Returns the list of workers and their registration status.
+        Returns the list of workers and their registration status. The list
+        is only rebuilt when workers have been added, removed or had their
+        status changed, so callers must not modify it.
 
         Returns
         -------
@@ -489,8 +694,10 @@ class WorkerManager(object):
             Each dictionary has keys WORKER_ID_KEY, REGISTRATION_STATUS_KEY giving the
             values.
         """
-        return [{WORKER_ID_KEY: worker_id, REGISTRATION_STATUS_KEY: value}
-                for worker_id, value in self.registered_workers.items()]
+        if self._worker_list is None:
+            self._worker_list = [{WORKER_ID_KEY: worker_id, REGISTRATION_STATUS_KEY: value}
+                                 for worker_id, value in self.registered_workers.items()]
+        return self._worker_list
 
     def is_worker_allowed(self, worker_id):
         """
@@ -515,4 +722,4 @@ class WorkerManager(object):
         bool:
             True if worker is allowed False otherwise.
         """
-        return worker_id in self.registered_workers and self.registered_workers[worker_id]
+        return self.registered_workers.get(worker_id, False)
@@ -1,6 +1,8 @@
 """
 Some common utility functions.
 """
+import orjson
+
 from dc_federated.backend._constants import GLOBAL_MODEL, GLOBAL_MODEL_VERSION
 
 
@@ -57,6 +59,26 @@ def message_seriously_wrong(msg):
     return f"Something went seriously wrong - {msg}. Contact the application engineer immeidiately."
 
 
+def json_dumps(obj):
+    """
+    Serializes obj to a JSON string using orjson, which is much faster
+    than the standard library json module.
+
+    Parameters
+    ----------
+
+    obj: object
+        The object to serialize.
+
+    Returns
+    -------
+
+    str:
+        The JSON serialization of obj.
+    """
+    return orjson.dumps(obj).decode('utf-8')
+
+
 def verify_dict(dct, keys, data_types):
     """
     Verify that the dictionary has the necessary structure.
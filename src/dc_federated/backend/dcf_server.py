@@ -5,14 +5,19 @@ machine learning logic.
 """
 import gevent
 from gevent import monkey; monkey.patch_all()
-from gevent import Greenlet, queue, pool
+from gevent import queue, pool
+from gevent.event import Event, AsyncResult
 
 import os
-import json
 import os.path
 import zlib
 import msgpack
+import orjson
 import hashlib
+import hmac
+import struct
+from operator import attrgetter
+import zstandard
 
 from bottle import Bottle, run, request, response, auth_basic, ServerAdapter
 
@@ -27,6 +32,66 @@ import logging
 logger = logging.getLogger(__name__)
 logger.setLevel(level=logging.INFO)
 
+# (rule, method, name of the DCFServer attribute handling it, whether admin only)
+_ROUTES = (
+    (f"/{REGISTER_WORKER_ROUTE}", 'POST', 'add_and_register_worker', False),
+    (f"/{CHALLENGE_PHRASE_ROUTE}/<worker_id>", 'GET', 'worker_manager.get_challenge_phrase', False),
+    (f"/{RETURN_GLOBAL_MODEL_ROUTE}", 'POST', 'return_global_model', False),
+    (f"/{NOTIFY_ME_IF_GM_VERSION_UPDATED_ROUTE}", 'POST', 'notify_me_if_gm_version_updated', False),
+    (f"/{RECEIVE_WORKER_UPDATE_ROUTE}/<worker_id>", 'POST', 'receive_worker_update', False),
+    (f"/{WORKERS_ROUTE}", 'GET', 'admin_list_workers', True),
+    (f"/{WORKERS_ROUTE}", 'POST', 'admin_add_worker', True),
+    (f"/{WORKERS_ROUTE}/<worker_id>", 'DELETE', 'admin_delete_worker', True),
+    (f"/{WORKERS_ROUTE}/<worker_id>", 'PUT', 'admin_set_worker_status', True),
+)
+
+_CORS_HEADERS = (
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Methods', 'GET, POST, PUT, OPTIONS'),
+    ('Access-Control-Allow-Headers', 'Origin, Accept, Content-Type, X-Requested-With, X-CSRF-Token'),
+)
+
+
+def read_request_json():
+    """
+    Parses the JSON body of the current request with orjson. As with bottle's
+    request.json, only application/json bodies are parsed, and bodies larger
+    than request.MEMFILE_MAX are rejected with a 413 status.
+
+    Returns
+    -------
+
+    object:
+        The parsed JSON, or None if the body is not valid JSON, not JSON or
+        too large. Handlers pass this to DCFServer.validate_input, which then
+        reports the invalid input.
+    """
+    content_type = request.content_type.lower().split(';')[0].strip()
+    if content_type not in ('application/json', 'application/json-rpc'):
+        return None
+    if request.content_length > request.MEMFILE_MAX:
+        response.status = 413
+        return None
+    body = request.body.read(request.MEMFILE_MAX + 1)
+    if len(body) > request.MEMFILE_MAX:
+        response.status = 413
+        return None
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+
+
+def msgpack_bin_header(size):
+    """
+    Returns the msgpack bin format header for a binary value of the given size.
+    """
+    if size < 2 ** 8:
+        return struct.pack('>BB', 0xc4, size)
+    if size < 2 ** 16:
+        return struct.pack('>BH', 0xc5, size)
+    return struct.pack('>BI', 0xc6, size)
+
 
 class DCFServer(object):
     """
@@ -79,7 +144,9 @@ class DCFServer(object):
 
     load_last_session_workers: bool (default True)
         When running in safe mode, whether or not to load the workers
-        from the previous session.
+        from the previous session. Workers that were registered in the
+        previous session are passed to register_worker_callback when the
+        server starts.
 
     path_to_keys_db: str
         Path to the database of workers' public keys that has been added.
@@ -105,7 +172,29 @@ class DCFServer(object):
 
     model_check_interval: int
         The interval of time between the server checking for an updated
-        model for the long polling.
+        model for the long polling. Servers that call notify_new_global_model()
+        whenever the global model version changes notify the workers
+        immediately, in which case this is only a fallback.
+
+    max_greenlets: int (default None)
+        The maximum number of concurrent long polling requests. Further
+        requests are rejected with a 503 status, asking the workers to retry
+        after SERVER_BUSY_RETRY_AFTER seconds. If None, the value of the
+        DCF_SERVER_MAX_GREENLETS environment variable is used, falling back
+        to 1000.
+
+    compress_level: int (default 1)
+        The zlib compression level used for the global model sent to workers
+        that do not support zstd. Higher levels give slightly smaller models
+        at a much higher CPU cost.
+
+    max_upload_size: int (default MAX_UPLOAD_SIZE)
+        The maximum size in bytes of a worker's compressed model update
+        upload. Larger uploads are rejected with a 413 status.
+
+    max_decompressed_update_size: int (default MAX_DECOMPRESSED_UPDATE_SIZE)
+        The maximum size in bytes of a worker's model update once
+        decompressed. Larger updates are rejected with a 413 status.
     """
     def __init__(
         self,
@@ -124,6 +213,10 @@ class DCFServer(object):
         ssl_keyfile=None,
         ssl_certfile=None,
         model_check_interval=10,
+        max_greenlets=None,
+        compress_level=1,
+        max_upload_size=MAX_UPLOAD_SIZE,
+        max_decompressed_update_size=MAX_DECOMPRESSED_UPDATE_SIZE,
         debug=False
     ):
         self.server_host_ip = get_host_ip() if server_host_ip is None else server_host_ip
@@ -135,13 +228,33 @@ class DCFServer(object):
         self.is_global_model_most_recent = is_global_model_most_recent
         self.receive_worker_update_callback = receive_worker_update_callback
 
+        # the admin credentials are read once, when the server is created.
+        self._adm_username = DCFServer._get_env_bytes(ADMIN_USERNAME)
+        self._adm_password = DCFServer._get_env_bytes(ADMIN_PASSWORD)
+
         self.worker_manager = WorkerManager(server_mode_safe,
                                             key_list_file,
                                             load_last_session_workers,
                                             path_to_keys_db)
 
-        self.gevent_pool = pool.Pool(None)
+        # created once as setting up the packing context is not free. The
+        # (de)compression contexts are created per call instead, as they are
+        # used from the hub's threadpool and are not thread safe.
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self.compress_level = compress_level
+        self.max_upload_size = max_upload_size
+        self.max_decompressed_update_size = max_decompressed_update_size
+
+        # compression -> (global model version, AsyncResult of the compressed
+        # global model), so that concurrent requests share a single compression.
+        self._gm_cache = {}
+
+        if max_greenlets is None:
+            max_greenlets = int(os.environ.get(MAX_GREENLETS, DEFAULT_MAX_GREENLETS))
+        self.gevent_pool = pool.Pool(max_greenlets)
+        # worker_id -> (greenlet, queue) of the worker's pending long polling request.
         self.model_version_req_dict = {}
+        self._new_version_event = Event()
         self.model_check_interval = model_check_interval
         self.debug = debug
 
@@ -159,8 +272,7 @@ class DCFServer(object):
             self.ssl_keyfile = ssl_keyfile
             self.ssl_certfile = ssl_certfile
 
-    @staticmethod
-    def is_admin(username, password):
+    def is_admin(self, username, password):
         """
         Callback for bottle to check that the requester is authorized to
         act as an admin for the server.
@@ -179,13 +291,21 @@ class DCFServer(object):
         bool:
             True if the user/password us valid, false otherwise.
         """
-        adm_username = os.environ.get(ADMIN_USERNAME)
-        adm_password = os.environ.get(ADMIN_PASSWORD)
-
-        if adm_username is None or adm_password is None:
+        if self._adm_username is None or self._adm_password is None:
             return False
 
-        return username == adm_username and password == adm_password
+        # compare both in constant time so the response time does not leak the credentials.
+        return hmac.compare_digest(username.encode('utf-8'), self._adm_username) & \
+            hmac.compare_digest(password.encode('utf-8'), self._adm_password)
+
+    @staticmethod
+    def _get_env_bytes(name):
+        """
+        Returns the utf-8 encoded value of the environment variable name,
+        or None if it is not set.
+        """
+        value = os.environ.get(name)
+        return None if value is None else value.encode('utf-8')
 
     @staticmethod
     def validate_input(dct, keys, data_types):
@@ -232,7 +352,7 @@ class DCFServer(object):
         str:
             The id of the new client, or INVALID_WORKER if the process failed.
         """
-        worker_data = request.json
+        worker_data = read_request_json()
         valid_failed = DCFServer.validate_input(worker_data, [PUBLIC_KEY_STR], [str])
         if ERROR_MESSAGE_KEY in valid_failed:
             logger.error(valid_failed[ERROR_MESSAGE_KEY])
@@ -261,7 +381,7 @@ class DCFServer(object):
         str:
             JSON in string form containing id of workers and their registration status.
         """
-        return json.dumps(self.worker_manager.get_worker_list())
+        return json_dumps(self.worker_manager.get_worker_list())
 
     def admin_add_worker(self):
         """
@@ -277,14 +397,14 @@ class DCFServer(object):
             JSON in string form either containing the id of the worker added + its
             registration status or an error message if that failed.
         """
-        worker_data = request.json
+        worker_data = read_request_json()
 
         valid_failed = DCFServer.validate_input(worker_data,
                                 [PUBLIC_KEY_STR, REGISTRATION_STATUS_KEY],
                                 [str, bool])
         if ERROR_MESSAGE_KEY in valid_failed:
             logger.error(valid_failed[ERROR_MESSAGE_KEY])
-            return json.dumps(valid_failed)
+            return json_dumps(valid_failed)
 
         logger.info("Admin is adding a new worker...")
 
@@ -293,12 +413,12 @@ class DCFServer(object):
             err_msg = f"Unable to validate public key (short) {worker_data[PUBLIC_KEY_STR][0:WID_LEN]} "\
                        "- worker not added."
             logger.warning(err_msg)
-            return json.dumps({
+            return json_dumps({
                 ERROR_MESSAGE_KEY: err_msg
             })
 
         if not success:
-            return json.dumps({ERROR_MESSAGE_KEY: f"Worker {worker_id[0:WID_LEN]} already exists."})
+            return json_dumps({ERROR_MESSAGE_KEY: f"Worker {worker_id[0:WID_LEN]} already exists."})
 
         worker_id = self.worker_manager.set_registration_status(
             worker_id, worker_data[REGISTRATION_STATUS_KEY])
@@ -306,12 +426,12 @@ class DCFServer(object):
         if worker_id == INVALID_WORKER:
             error_str = message_seriously_wrong("worker was just added but now being reported as not added")
             logger.error(error_str)
-            return json.dumps({ERROR_MESSAGE_KEY: error_str})
+            return json_dumps({ERROR_MESSAGE_KEY: error_str})
 
         if worker_data[REGISTRATION_STATUS_KEY]:
             self.register_worker_callback(worker_id)
 
-        return json.dumps({
+        return json_dumps({
             SUCCESS_MESSAGE_KEY: f"Successfully added worker {worker_id[0:WID_LEN]}.",
             WORKER_ID_KEY: worker_id,
             REGISTRATION_STATUS_KEY: worker_data[REGISTRATION_STATUS_KEY]
@@ -344,9 +464,9 @@ class DCFServer(object):
 
         worker_id = self.worker_manager.remove_worker(worker_id)
         if worker_id == INVALID_WORKER:
-            return json.dumps({ERROR_MESSAGE_KEY: f"Attempt to remove unknown worker {worker_id[0:WID_LEN]}."})
+            return json_dumps({ERROR_MESSAGE_KEY: f"Attempt to remove unknown worker {worker_id[0:WID_LEN]}."})
 
-        return json.dumps({
+        return json_dumps({
             WORKER_ID_KEY: worker_id,
             SUCCESS_MESSAGE_KEY: f"Successfully removed worker {worker_id[0:WID_LEN]}."
         })
@@ -369,20 +489,20 @@ class DCFServer(object):
             registration status or error message if the operation failed for
             some reason.
         """
-        worker_data = request.json
+        worker_data = read_request_json()
 
         logger.info(f"Admin is setting the status of {worker_id[0:WID_LEN]}...")
         valid_failed = DCFServer.validate_input(worker_data, [REGISTRATION_STATUS_KEY], [bool])
         if ERROR_MESSAGE_KEY in valid_failed:
             logger.error(valid_failed[ERROR_MESSAGE_KEY])
-            return json.dumps(valid_failed)
+            return json_dumps(valid_failed)
 
         was_registered = self.worker_manager.is_worker_registered(worker_id)
         worker_id = self.worker_manager.set_registration_status(
             worker_id, worker_data[REGISTRATION_STATUS_KEY])
 
         if worker_id == INVALID_WORKER:
-            return json.dumps({
+            return json_dumps({
                 ERROR_MESSAGE_KEY: f"Attempt at changing worker status failed - "
                                    f"please ensure this worker was added: {worker_id[0:WID_LEN]}."
             })
@@ -396,12 +516,78 @@ class DCFServer(object):
         if was_registered and not worker_data[REGISTRATION_STATUS_KEY]:
             self.unregister_worker_callback(worker_id)
 
-        return json.dumps({
+        return json_dumps({
             SUCCESS_MESSAGE_KEY: f"Successfully changed status for worker {worker_id[0:WID_LEN]}.",
             WORKER_ID_KEY: worker_id,
             REGISTRATION_STATUS_KEY: worker_data[REGISTRATION_STATUS_KEY]
         })
 
+    def decompress_and_hash(self, update_file, compression):
+        """
+        Decompresses the model update in update_file in chunks, computing
+        its sha256 digest in the same pass over the data.
+
+        Parameters
+        ----------
+
+        update_file: file-like
+            The uploaded, compressed model update.
+
+        compression: str
+            ZSTD_COMPRESSION if the update was compressed with zstd. Workers
+            from earlier versions send zlib compressed updates with no
+            compression header, so anything else is treated as zlib.
+
+        Returns
+        -------
+
+        bytes, bytes:
+            The decompressed model update and its sha256 digest, or None, None
+            if the decompressed update is larger than max_decompressed_update_size.
+        """
+        if compression == ZSTD_COMPRESSION:
+            reader = zstandard.ZstdDecompressor().stream_reader(update_file)
+            chunks = iter(lambda: reader.read(MODEL_UPDATE_CHUNK_SIZE), b'')
+        else:
+            chunks = DCFServer.zlib_decompress_chunks(update_file)
+
+        # the chunks are joined once at the end, rather than accumulated in a
+        # bytearray which then has to be copied again into the bytes passed on.
+        model_update = []
+        model_update_size = 0
+        model_update_hash = hashlib.sha256()
+        for chunk in chunks:
+            model_update_size += len(chunk)
+            if model_update_size > self.max_decompressed_update_size:
+                return None, None
+            model_update_hash.update(chunk)
+            model_update.append(chunk)
+        return b''.join(model_update), model_update_hash.digest()
+
+    @staticmethod
+    def zlib_decompress_chunks(update_file):
+        """
+        Generator decompressing the zlib compressed update_file into chunks of
+        at most MODEL_UPDATE_CHUNK_SIZE bytes, so that a small, highly
+        compressed input is never expanded in one go.
+
+        Parameters
+        ----------
+
+        update_file: file-like
+            The uploaded, zlib compressed model update.
+        """
+        decompressor = zlib.decompressobj()
+        # read into a single reused buffer rather than allocating a new bytes per chunk.
+        buffer = bytearray(MODEL_UPDATE_CHUNK_SIZE)
+        buffer_view = memoryview(buffer)
+        for size in iter(lambda: update_file.readinto(buffer), 0):
+            data = buffer_view[:size]
+            while data:
+                yield decompressor.decompress(data, MODEL_UPDATE_CHUNK_SIZE)
+                data = decompressor.unconsumed_tail
+        yield decompressor.flush()
+
     def receive_worker_update(self, worker_id):
         """
         This receives the update from a worker and calls the corresponding callback function.
@@ -414,32 +600,52 @@ class DCFServer(object):
             If the update was successful then "Worker update received"
             Otherwise any exception that was raised.
         """
+        worker_manager = self.worker_manager
         try:
+            # reject oversized uploads before bottle parses the body.
+            if request.content_length > self.max_upload_size:
+                error_message = f"Model update from worker {worker_id[0:WID_LEN]} is too large."
+                logger.error(error_message)
+                response.status = 413
+                return json_dumps({ERROR_MESSAGE_KEY: error_message})
+
             worker_data = request.files
             if SIGNED_PHRASE not in worker_data:
                 error_message = f"{SIGNED_PHRASE} not found in worker update payload."
                 logger.error(error_message)
-                return json.dumps({ERROR_MESSAGE_KEY: error_message})
+                return json_dumps({ERROR_MESSAGE_KEY: error_message})
 
-            model_update = zlib.decompress(worker_data[WORKER_MODEL_UPDATE_KEY].file.read())
-
-            verify_worker = self.worker_manager.authenticate_worker(
-                worker_id,
-                worker_data[SIGNED_PHRASE].file.read().decode('utf-8'),
-                hashlib.sha256(model_update).digest()
-            )
-            if not verify_worker:
-                logger.error(f"Unable to verify worker with id {worker_id[0:WID_LEN]}")
+            if not worker_manager.is_worker_allowed(worker_id):
+                logger.warning(f"Unknown worker {worker_id[0:WID_LEN]} tried to send an update.")
                 return INVALID_WORKER
 
-            if not self.worker_manager.is_worker_allowed(worker_id):
-                logger.warning(f"Unknown worker {worker_id[0:WID_LEN]} tried to send an update.")
+            # check the signature on its own first so that updates from workers that
+            # fail to authenticate are rejected before doing any decompression.
+            signed_phrase = worker_data[SIGNED_PHRASE].file.read().decode('utf-8')
+            if not worker_manager.authenticate_worker(worker_id, signed_phrase):
+                logger.error(f"Unable to verify worker with id {worker_id[0:WID_LEN]}")
                 return INVALID_WORKER
 
-            if not self.worker_manager.is_worker_registered(worker_id):
+            if not worker_manager.is_worker_registered(worker_id):
                 logger.warning(f"Unregistered worker {worker_id[0:WID_LEN]} tried to send an update.")
                 return UNREGISTERED_WORKER
 
+            # zlib, zstd and hashlib release the GIL, so decompressing in the hub's
+            # threadpool lets the other greenlets run in the meantime.
+            model_update, model_update_digest = gevent.get_hub().threadpool.apply(
+                self.decompress_and_hash,
+                (worker_data[WORKER_MODEL_UPDATE_KEY].file, request.get_header(COMPRESSION_HEADER)))
+            if model_update is None:
+                error_message = f"Model update from worker {worker_id[0:WID_LEN]} is too large."
+                logger.error(error_message)
+                response.status = 413
+                return json_dumps({ERROR_MESSAGE_KEY: error_message})
+
+            # the signature was verified above, so this only compares the signed digest.
+            if not worker_manager.authenticate_worker(worker_id, signed_phrase, model_update_digest):
+                logger.error(f"Unable to verify worker with id {worker_id[0:WID_LEN]}")
+                return INVALID_WORKER
+
             logger.info(f'Received model update from worker {worker_id[0:WID_LEN]}.')
             return self.receive_worker_update_callback(worker_id, model_update)
 
@@ -447,6 +653,16 @@ class DCFServer(object):
             logger.warning(e)
             return str(e)
 
+    def notify_new_global_model(self):
+        """
+        Wakes up all the pending global model version change notification
+        requests so that they check the global model version immediately.
+        This should be called by the server-side algorithm whenever the
+        global model version changes.
+        """
+        new_version_event, self._new_version_event = self._new_version_event, Event()
+        new_version_event.set()
+
     def check_model_version_updated(self, worker_id, body, last_worker_model_version):
         """
         Greenlet function run to check with the implementation of the
@@ -462,23 +678,23 @@ class DCFServer(object):
         last_worker_model_version: object
             The version of the last model that the worker was using.
         """
-        while self.is_global_model_most_recent(last_worker_model_version):
-            gevent.sleep(self.model_check_interval)
-
-        model_update = self.return_global_model_callback()
-        if not is_valid_model_dict(model_update):
-            logger.error(f"Expected dictionary with {GLOBAL_MODEL} and {GLOBAL_MODEL_VERSION} keys - "
-                         "return_global_model_callback() implementation is incorrect")
+        is_global_model_most_recent = self.is_global_model_most_recent
+        while True:
+            # grab the event before checking so a notification in between is not missed.
+            new_version_event = self._new_version_event
+            if not is_global_model_most_recent(last_worker_model_version):
+                break
+            new_version_event.wait(timeout=self.model_check_interval)
+
+        # the model itself is fetched, validated and compressed once per version
+        # when the workers request it, so it is not needed here.
         body.put(GLOBAL_MODEL_UPDATED_STRING)
         body.put(StopIteration)
-        logger.info(f"Notified global model version changed to {worker_id[0:WID_LEN]}.")
+        logger.debug("Notified global model version changed to %s.", worker_id[0:WID_LEN])
 
-        # clean up the list of model requests for this worker
-        if len(self.model_version_req_dict[worker_id]) > 0:
-            self.model_version_req_dict[worker_id].pop()
-        if len(self.model_version_req_dict[worker_id]) > 0:
-            message_seriously_wrong(f"in 'check_model_ready', "
-                                    f"more than one entry in the 'mode_req_dict' for {worker_id[0:WID_LEN]}")
+        # clean up the model request for this worker, unless it has already been replaced.
+        if self.model_version_req_dict.get(worker_id, (None, None))[1] is body:
+            del self.model_version_req_dict[worker_id]
 
     def notify_me_if_gm_version_updated(self):
         """
@@ -487,7 +703,7 @@ class DCFServer(object):
         the worker.
         """
         try:
-            query_request = request.json
+            query_request = read_request_json()
             valid_failed = DCFServer.validate_input(
                 query_request,
                 [WORKER_ID_KEY, LAST_WORKER_MODEL_VERSION, SIGNED_PHRASE],
@@ -495,42 +711,36 @@ class DCFServer(object):
             )
             if ERROR_MESSAGE_KEY in valid_failed:
                 logger.error(valid_failed[ERROR_MESSAGE_KEY])
-                return json.dumps({ERROR_MESSAGE_KEY: valid_failed[ERROR_MESSAGE_KEY]})
+                return json_dumps({ERROR_MESSAGE_KEY: valid_failed[ERROR_MESSAGE_KEY]})
 
             worker_id = query_request[WORKER_ID_KEY]
-            if not self.worker_manager.is_worker_allowed(worker_id):
-                logger.warning(f"Unknown worker {worker_id[0:WID_LEN]} tried to get the global model.")
-                return INVALID_WORKER
-
-            if not self.worker_manager.verify_challenge(worker_id, query_request[SIGNED_PHRASE]):
-                logger.error(f"Failed to verify worker with id {worker_id[0:WID_LEN]}")
-                return INVALID_WORKER
+            auth_status = self.worker_manager.check_polling_auth(worker_id, query_request[SIGNED_PHRASE])
+            if auth_status != AUTHENTICATED:
+                return auth_status
 
-            if not self.worker_manager.is_worker_registered(worker_id):
-                logger.warning(f"Unregistered worker {worker_id[0:WID_LEN]} tried to get the global model.")
-                return UNREGISTERED_WORKER
-
-            logger.info(f"Received request for global model version change notification from {worker_id[0:WID_LEN]}.")
+            logger.debug("Received request for global model version change notification from %s.", worker_id[0:WID_LEN])
             # in case a new request is made, terminate the old one
-            if worker_id in self.model_version_req_dict and \
-                    len(self.model_version_req_dict[worker_id]) > 0:
-                old_g, old_b = self.model_version_req_dict[worker_id].pop()
+            old_request = self.model_version_req_dict.pop(worker_id, None)
+            if old_request is not None:
+                old_g, old_b = old_request
                 msg = f"New request for global model version change notification received from {worker_id[0:WID_LEN]} - " \
                       "existing request terminated."
                 logger.info(msg)
                 old_b.put(msg)
                 old_b.put(StopIteration)
                 old_g.kill()
-                if len(self.model_version_req_dict[worker_id]) > 0:
-                    message_seriously_wrong(f"in 'return_global_model', "
-                                            f"more than one entry in the 'mode_req_dict' for {worker_id[0:WID_LEN]}")
+
+            # adding to a full pool would block this request's greenlet.
+            if self.gevent_pool.full():
+                logger.warning(f"Too many long polling requests - rejected request from {worker_id[0:WID_LEN]}.")
+                response.status = 503
+                response.set_header('Retry-After', str(SERVER_BUSY_RETRY_AFTER))
+                return SERVER_BUSY
+
             body = gevent.queue.Queue()
-            g = Greenlet(self.check_model_version_updated, worker_id, body, query_request[LAST_WORKER_MODEL_VERSION])
-            self.gevent_pool.add(g)
-            if worker_id not in self.model_version_req_dict:
-                self.model_version_req_dict[worker_id] = []
-            self.model_version_req_dict[worker_id].append((g, body))
-            g.start()
+            g = self.gevent_pool.spawn(
+                self.check_model_version_updated, worker_id, body, query_request[LAST_WORKER_MODEL_VERSION])
+            self.model_version_req_dict[worker_id] = (g, body)
 
             return body
 
@@ -556,44 +766,141 @@ class DCFServer(object):
             a string indicating an error has occured.
         """
         try:
-            query_request = request.json
+            query_request = read_request_json()
 
             valid_failed = DCFServer.validate_input(
                 query_request, [WORKER_ID_KEY, SIGNED_PHRASE], [str, str])
             if ERROR_MESSAGE_KEY in valid_failed:
                 logger.error(valid_failed[ERROR_MESSAGE_KEY])
-                return json.dumps({ERROR_MESSAGE_KEY: valid_failed[ERROR_MESSAGE_KEY]})
+                return json_dumps({ERROR_MESSAGE_KEY: valid_failed[ERROR_MESSAGE_KEY]})
 
             worker_id = query_request[WORKER_ID_KEY]
-            if not self.worker_manager.is_worker_allowed(worker_id):
-                logger.warning(f"Unknown worker {worker_id[0:WID_LEN]} tried to get the global model.")
-                return INVALID_WORKER
+            auth_status = self.worker_manager.check_polling_auth(worker_id, query_request[SIGNED_PHRASE])
+            if auth_status != AUTHENTICATED:
+                return auth_status
 
-            if not self.worker_manager.verify_challenge(worker_id, query_request[SIGNED_PHRASE]):
-                logger.error(f"Failed to verify worker with id {worker_id[0:WID_LEN]}")
-                return INVALID_WORKER
-
-            if not self.worker_manager.is_worker_registered(worker_id):
-                logger.warning(f"Unregistered worker {worker_id[0:WID_LEN]} tried to get the global model.")
-                return UNREGISTERED_WORKER
-
-            logger.info(f"Returned global model to {worker_id[0:WID_LEN]}.")
-            return zlib.compress(msgpack.packb(self.return_global_model_callback()))
+            logger.debug("Returned global model to %s.", worker_id[0:WID_LEN])
+            # only use zstd if the worker says it supports it.
+            compression = ZSTD_COMPRESSION \
+                if request.get_header(COMPRESSION_HEADER) == ZSTD_COMPRESSION else ZLIB_COMPRESSION
+            response.set_header(COMPRESSION_HEADER, compression)
+            return self.compressed_global_model(compression)
 
         except Exception as e:
             logger.warning(str(e.__class__) + str(e))
             return str(e)
 
+    def compressed_global_model(self, compression):
+        """
+        Returns the serialized and compressed global model. As every worker
+        fetches the same global model, the compressed model is cached and only
+        recomputed when the global model version changes.
+
+        Parameters
+        ----------
+
+        compression: str
+            ZSTD_COMPRESSION or ZLIB_COMPRESSION.
+
+        Returns
+        -------
+
+        bytes:
+            The compressed msgpack serialization of the global model dict.
+        """
+        model_dict = self.return_global_model_callback()
+        if is_valid_model_dict(model_dict):
+            version = model_dict[GLOBAL_MODEL_VERSION]
+        else:
+            logger.error(f"Expected dictionary with {GLOBAL_MODEL} and {GLOBAL_MODEL_VERSION} keys - "
+                         "return_global_model_callback() implementation is incorrect")
+            version = None
+        cached_version, cached_result = self._gm_cache.get(compression, (None, None))
+        if version is not None and version == cached_version:
+            # waits for the compression if another request has already started it.
+            return cached_result.get()
+
+        result = AsyncResult()
+        if version is not None:
+            self._gm_cache[compression] = (version, result)
+        try:
+            # compress in the hub's threadpool so that other greenlets keep running.
+            compressed_model = gevent.get_hub().threadpool.apply(
+                self.compress_model_data, (self.pack_model_dict(model_dict), compression))
+        except Exception as e:
+            result.set_exception(e)
+            # let the next request try again.
+            if self._gm_cache.get(compression, (None, None))[1] is result:
+                del self._gm_cache[compression]
+            raise
+        result.set(compressed_model)
+        return compressed_model
+
+    def compress_model_data(self, model_data, compression):
+        """
+        Compresses the pieces of a serialized model dict.
+
+        Parameters
+        ----------
+
+        model_data: list of bytes-like
+            The pieces of the serialization, as returned by pack_model_dict.
+
+        compression: str
+            ZSTD_COMPRESSION or ZLIB_COMPRESSION.
+
+        Returns
+        -------
+
+        bytes:
+            The compressed concatenation of model_data.
+        """
+        if compression == ZSTD_COMPRESSION:
+            # the size is written to the frame header, as the workers decompress in one go.
+            compressor = zstandard.ZstdCompressor(level=3, threads=-1).compressobj(
+                size=sum(len(data) for data in model_data))
+        else:
+            compressor = zlib.compressobj(self.compress_level)
+        return b''.join([compressor.compress(data) for data in model_data] + [compressor.flush()])
+
+    def pack_model_dict(self, model_dict):
+        """
+        Serializes the model dict with msgpack as a list of pieces which, when
+        concatenated, equal msgpack.packb(model_dict, use_bin_type=True).
+        bytes values, such as the serialized global model, are returned as is
+        after their msgpack header rather than being copied into a new buffer.
+
+        Parameters
+        ----------
+
+        model_dict: dict
+            The model dictionary returned by return_global_model_callback.
+
+        Returns
+        -------
+
+        list of bytes-like:
+            The pieces of the msgpack serialization of model_dict.
+        """
+        if not isinstance(model_dict, dict):
+            return [self._packer.pack(model_dict)]
+        model_data = [self._packer.pack_map_header(len(model_dict))]
+        for key, value in model_dict.items():
+            model_data.append(self._packer.pack(key))
+            if isinstance(value, (bytes, bytearray)):
+                model_data.append(msgpack_bin_header(len(value)))
+                model_data.append(value)
+            else:
+                model_data.append(self._packer.pack(value))
+        return model_data
+
     @staticmethod
     def enable_cors():
         """
         Enable the cross origin resource for the server.
         """
-        response.add_header('Access-Control-Allow-Origin', '*')
-        response.add_header('Access-Control-Allow-Methods',
-                            'GET, POST, PUT, OPTIONS')
-        response.add_header('Access-Control-Allow-Headers',
-                            'Origin, Accept, Content-Type, X-Requested-With, X-CSRF-Token')
+        for name, value in _CORS_HEADERS:
+            response.set_header(name, value)
 
     def start_server(self, server_adapter=None):
         """
@@ -605,28 +912,22 @@ class DCFServer(object):
             object.
         """
         application = Bottle()
-        application.route(f"/{REGISTER_WORKER_ROUTE}",
-                          method='POST', callback=self.add_and_register_worker)
-        application.route(f"/{CHALLENGE_PHRASE_ROUTE}/<worker_id>",
-                          method='GET', callback=self.worker_manager.get_challenge_phrase)
-        application.route(f"/{RETURN_GLOBAL_MODEL_ROUTE}",
-                          method='POST', callback=self.return_global_model)
-        application.route(f"/{NOTIFY_ME_IF_GM_VERSION_UPDATED_ROUTE}",
-                          method='POST', callback=self.notify_me_if_gm_version_updated)
-        application.route(f"/{RECEIVE_WORKER_UPDATE_ROUTE}/<worker_id>",
-                          method='POST', callback=self.receive_worker_update)
+        for rule, method, callback_name, admin_only in _ROUTES:
+            callback = attrgetter(callback_name)(self)
+            if admin_only:
+                callback = auth_basic(self.is_admin)(callback)
+            application.route(rule, method=method, callback=callback)
 
         application.add_hook('after_request', self.enable_cors)
 
-        # Admin routes
-        application.get(
-            f"/{WORKERS_ROUTE}", callback=auth_basic(self.is_admin)(self.admin_list_workers))
-        application.post(
-            f"/{WORKERS_ROUTE}", callback=auth_basic(self.is_admin)(self.admin_add_worker))
-        application.delete(f"/{WORKERS_ROUTE}/<worker_id>",
-                           callback=auth_basic(self.is_admin)(self.admin_delete_worker))
-        application.put(f"/{WORKERS_ROUTE}/<worker_id>",
-                        callback=auth_basic(self.is_admin)(self.admin_set_worker_status))
+        # do the on-demand setup of the routes now rather than on their first request.
+        for route in application.routes:
+            route.prepare()
+
+        # let the application know about workers registered in the previous session.
+        for worker_id, registered in self.worker_manager.registered_workers.items():
+            if registered:
+                self.register_worker_callback(worker_id)
 
         if server_adapter is not None and isinstance(server_adapter, ServerAdapter):
             self.server_host_ip = server_adapter.host
@@ -10,6 +10,7 @@ from datetime import datetime
 import zlib
 import msgpack
 import hashlib
+import zstandard
 from nacl.signing import SigningKey, VerifyKey
 from nacl.encoding import HexEncoder
 
@@ -77,6 +78,9 @@ class DCFWorker(object):
         self.session = requests.Session()
         self.session.mount(f"{self.server_protocol}://", HTTPAdapter(max_retries=10))
 
+        self._zstd_c = zstandard.ZstdCompressor(level=3)
+        self._zstd_d = zstandard.ZstdDecompressor()
+
         if server_protocol == 'http' and server_host_ip != 'localhost':
             logger.warning("Security alert: https is not enabled!")
 
@@ -183,6 +187,8 @@ class DCFWorker(object):
     def get_global_model(self):
         """
         Gets the binary string of the current global model from the server.
+        If the server is too busy to accept the long polling request, waits
+        for the time it asks for and returns its response instead.
 
         Returns
         -------
@@ -202,7 +208,19 @@ class DCFWorker(object):
         response = self.session.post(
             f"{self.server_loc}/{NOTIFY_ME_IF_GM_VERSION_UPDATED_ROUTE}",
             json=data
-        ).content
+        )
+        if response.status_code == 503:
+            # the server has too many pending requests - back off rather than
+            # polling it again straight away.
+            try:
+                retry_after = int(response.headers.get('Retry-After', SERVER_BUSY_RETRY_AFTER))
+            except ValueError:
+                # e.g. an HTTP-date sent by a proxy in front of the server.
+                retry_after = SERVER_BUSY_RETRY_AFTER
+            logger.warning(f"Server busy - retrying in {retry_after} seconds.")
+            gevent.sleep(retry_after)
+            return response.content
+        response = response.content
         if response != GLOBAL_MODEL_UPDATED_STRING.encode():
             logger.error(f"Unable to retrieve confirmation global model has changed - received response {response}")
             logger.error("Global model not retrieved.")
@@ -214,12 +232,17 @@ class DCFWorker(object):
         data[SIGNED_PHRASE] = self.get_signed_phrase(challenge_phrase)
         del data[LAST_WORKER_MODEL_VERSION]
         response = self.session.post(f"{self.server_loc}/{RETURN_GLOBAL_MODEL_ROUTE}",
-                                     json=data).content
+                                     json=data, headers={COMPRESSION_HEADER: ZSTD_COMPRESSION})
+        compression = response.headers.get(COMPRESSION_HEADER)
+        response = response.content
         try:
-            model = msgpack.unpackb(zlib.decompress(response))
+            if compression == ZSTD_COMPRESSION:
+                model = msgpack.unpackb(self._zstd_d.decompress(response))
+            else:
+                model = msgpack.unpackb(zlib.decompress(response))
             logger.info(f"Received global model for worker {self.worker_id[0:WID_LEN]}")
             return model
-        except zlib.error as e:
+        except (zlib.error, zstandard.ZstdError) as e:
             fn = f'{self.worker_id[0:WID_LEN]}_server_error_{datetime.now().strftime("%Y_%m_%d-%H_%M_%S_%f")}'
             with open(fn, 'w') as f:
                 f.write(response)
@@ -239,9 +262,10 @@ class DCFWorker(object):
         """
         return self.session.post(
             f"{self.server_loc}/{RECEIVE_WORKER_UPDATE_ROUTE}/{self.worker_id}",
-            files={WORKER_MODEL_UPDATE_KEY: zlib.compress(model_update),
+            files={WORKER_MODEL_UPDATE_KEY: self._zstd_c.compress(model_update),
                    SIGNED_PHRASE: self.get_signed_phrase(hashlib.sha256(model_update).digest())
                    },
+            headers={COMPRESSION_HEADER: ZSTD_COMPRESSION}
         ).content
 
     def run(self):
@@ -1,6 +1,8 @@
 """
 Simple runner to start a example global model server.
 """
+# the standard library must be patched before anything else imports it.
+from gevent import monkey; monkey.patch_all()
 
 from dc_federated.examples.example_dcf_model import ExampleGlobalModel
 
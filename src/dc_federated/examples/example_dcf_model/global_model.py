@@ -20,17 +20,27 @@ logger.setLevel(level=logging.INFO)
 class ExampleGlobalModel(object):
     """
     This is a simple class that illustrates how the DCFServer class may be used to
-    implement a federated global model. For testing purposes, it writes all the
-    models it creates and receives to disk.
+    implement a federated global model.
+
+    Parameters
+    ----------
+
+    persist_models: bool (default False)
+        For testing purposes, write all the models it creates and receives
+        to disk.
     """
 
-    def __init__(self):
+    def __init__(self, persist_models=False):
         self.worker_updates = {}
         self.global_model = ExampleModelClass()
-        with open("egm_global_model.torch", 'wb') as f:
-            torch.save(self.global_model, f)
+        self.persist_models = persist_models
+        if self.persist_models:
+            with open("egm_global_model.torch", 'wb') as f:
+                torch.save(self.global_model, f)
 
         self.global_model_version = 0
+        # (global model version, serialized global model)
+        self._serialized_global_model = (None, None)
 
         self.server = DCFServer(
             register_worker_callback=self.register_worker,
@@ -79,10 +89,14 @@ class ExampleGlobalModel(object):
         dict:
             The model dictionary as per the specification in DCFSever
         """
-        logger.info(f"Example Global Model: returning global model")
-        model_data = io.BytesIO()
-        torch.save(self.global_model, model_data)
-        return create_model_dict(model_data.getvalue(), self.global_model_version)
+        logger.debug("Example Global Model: returning global model")
+        version, model_serialized = self._serialized_global_model
+        if version != self.global_model_version:
+            model_data = io.BytesIO()
+            torch.save(self.global_model, model_data)
+            model_serialized = model_data.getvalue()
+            self._serialized_global_model = (self.global_model_version, model_serialized)
+        return create_model_dict(model_serialized, self.global_model_version)
 
     def is_global_model_most_recent(self, model_version):
         """
@@ -99,7 +113,7 @@ class ExampleGlobalModel(object):
         str:
             String format of the last model update time.
         """
-        logger.info(f"Example Global Model: checking if model version is most recent.")
+        logger.debug("Example Global Model: checking if model version is most recent.")
         return self.global_model_version == model_version
 
     def receive_worker_update(self, worker_id, model_update):
@@ -116,10 +130,12 @@ class ExampleGlobalModel(object):
             self.worker_updates[worker_id] = \
                 torch.load(io.BytesIO(model_update))
             logger.info(f"Model update received from worker {worker_id[0:WID_LEN]}")
-            logger.info(self.worker_updates[worker_id])
-            with open(f"egm_worker_update_{worker_id}.torch", 'wb') as f:
-                torch.save(self.worker_updates[worker_id], f)
+            logger.debug("%s", self.worker_updates[worker_id])
+            if self.persist_models:
+                with open(f"egm_worker_update_{worker_id}.torch", 'wb') as f:
+                    torch.save(self.worker_updates[worker_id], f)
             self.global_model_version += 1
+            self.server.notify_new_global_model()
             return f"Update received for worker {worker_id[0:WID_LEN]}"
         else:
             return f"Unregistered worker {worker_id[0:WID_LEN]} tried to send an update!!"
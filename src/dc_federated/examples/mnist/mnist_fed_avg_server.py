@@ -1,6 +1,9 @@
 """
 Simple runner to start FedAvgServer server for the MNIST dataset.
 """
+# the standard library must be patched before anything else imports it.
+from gevent import monkey; monkey.patch_all()
+
 import argparse
 import sys
 
@@ -1,6 +1,8 @@
 """
 Run the server for the basic stress test.
 """
+# the standard library must be patched before anything else imports it.
+from gevent import monkey; monkey.patch_all()
 
 import sys
 import os
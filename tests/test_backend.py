@@ -6,14 +6,19 @@ import gevent
 from gevent import Greenlet, sleep
 from gevent import monkey; monkey.patch_all()
 
+import io
 import os
+import hashlib
 import msgpack
 import zlib
+import zstandard
 import requests
 import json
+from bottle import request, response
 
 from dc_federated.backend import DCFServer, DCFWorker, create_model_dict, is_valid_model_dict
 from dc_federated.backend._constants import *
+from dc_federated.backend.dcf_server import read_request_json
 from dc_federated.utils import StoppableServer, get_host_ip
 
 
@@ -201,3 +206,117 @@ def test_server_functionality():
         "UTF-8") == f"Update received for worker {worker_ids[3][0:WID_LEN]}."
 
     stoppable_server.shutdown()
+
+
+def test_global_model_serialization():
+    """
+    The global model is serialized in pieces and compressed incrementally -
+    check that this matches a plain msgpack serialization.
+    """
+    global_model_version = "1"
+    model_dict = create_model_dict(os.urandom(70000), global_model_version)
+
+    dcf_server = DCFServer(
+        register_worker_callback=lambda worker_id: None,
+        unregister_worker_callback=lambda worker_id: None,
+        return_global_model_callback=lambda: model_dict,
+        is_global_model_most_recent=lambda version: version == global_model_version,
+        receive_worker_update_callback=lambda worker_id, update: None,
+        server_mode_safe=False,
+        key_list_file=None
+    )
+
+    for model_serialized in [b'', os.urandom(200), os.urandom(70000)]:
+        model_dict[GLOBAL_MODEL] = model_serialized
+        assert b''.join(dcf_server.pack_model_dict(model_dict)) == msgpack.packb(model_dict, use_bin_type=True)
+
+    assert msgpack.unpackb(zlib.decompress(dcf_server.compressed_global_model(ZLIB_COMPRESSION))) == model_dict
+    assert msgpack.unpackb(zstandard.ZstdDecompressor().decompress(
+        dcf_server.compressed_global_model(ZSTD_COMPRESSION))) == model_dict
+
+
+def test_global_model_compressed_once():
+    """
+    Concurrent requests for the same global model version share a single
+    compression.
+    """
+    global_model_version = "1"
+    model_dict = create_model_dict(os.urandom(2 * 1024 ** 2), global_model_version)
+
+    dcf_server = DCFServer(
+        register_worker_callback=lambda worker_id: None,
+        unregister_worker_callback=lambda worker_id: None,
+        return_global_model_callback=lambda: model_dict,
+        is_global_model_most_recent=lambda version: version == global_model_version,
+        receive_worker_update_callback=lambda worker_id, update: None,
+        server_mode_safe=False,
+        key_list_file=None
+    )
+
+    compressions = []
+    compress_model_data = dcf_server.compress_model_data
+
+    def counting_compress_model_data(model_data, compression):
+        compressions.append(compression)
+        return compress_model_data(model_data, compression)
+    dcf_server.compress_model_data = counting_compress_model_data
+
+    requests_gl = [gevent.spawn(dcf_server.compressed_global_model, ZSTD_COMPRESSION) for _ in range(20)]
+    gevent.joinall(requests_gl, raise_error=True)
+    assert compressions == [ZSTD_COMPRESSION]
+    assert msgpack.unpackb(zstandard.ZstdDecompressor().decompress(requests_gl[0].value)) == model_dict
+    assert all(request_gl.value == requests_gl[0].value for request_gl in requests_gl)
+
+    # a new version is compressed again
+    global_model_version = "2"
+    model_dict[GLOBAL_MODEL_VERSION] = global_model_version
+    dcf_server.compressed_global_model(ZSTD_COMPRESSION)
+    assert compressions == [ZSTD_COMPRESSION] * 2
+
+
+def test_decompressed_update_size_limit():
+    dcf_server = DCFServer(
+        register_worker_callback=lambda worker_id: None,
+        unregister_worker_callback=lambda worker_id: None,
+        return_global_model_callback=lambda: None,
+        is_global_model_most_recent=lambda version: True,
+        receive_worker_update_callback=lambda worker_id, update: None,
+        server_mode_safe=False,
+        key_list_file=None,
+        max_decompressed_update_size=100000
+    )
+
+    compressors = {ZLIB_COMPRESSION: zlib.compress, ZSTD_COMPRESSION: zstandard.ZstdCompressor().compress}
+    for compression, compress in compressors.items():
+        # updates up to the limit are accepted
+        model_update = os.urandom(100000)
+        assert dcf_server.decompress_and_hash(io.BytesIO(compress(model_update)), compression) == \
+            (model_update, hashlib.sha256(model_update).digest())
+
+        # larger ones are rejected
+        assert dcf_server.decompress_and_hash(io.BytesIO(compress(bytes(100001))), compression) == (None, None)
+
+
+def test_read_request_json():
+    def bind_request(body, content_type='application/json'):
+        request.bind({'REQUEST_METHOD': 'POST',
+                      'CONTENT_TYPE': content_type,
+                      'CONTENT_LENGTH': str(len(body)),
+                      'wsgi.input': io.BytesIO(body)})
+        response.bind()
+
+    bind_request(b'{"worker_id": "abc"}')
+    assert read_request_json() == {WORKER_ID_KEY: 'abc'}
+    assert response.status_code == 200
+
+    # only json bodies are parsed
+    bind_request(b'{"worker_id": "abc"}', content_type='text/plain')
+    assert read_request_json() is None
+
+    bind_request(b'{"worker_id": ')
+    assert read_request_json() is None
+
+    # oversized bodies are rejected without being parsed
+    bind_request(json.dumps({WORKER_ID_KEY: 'a' * request.MEMFILE_MAX}).encode())
+    assert read_request_json() is None
+    assert response.status_code == 413
@@ -29,7 +29,7 @@ def test_example():
     parameters, written to disk by the two objects, that their parameters are
     identical or same as required by the logic.
     """
-    egm = ExampleGlobalModel()
+    egm = ExampleGlobalModel(persist_models=True)
     server_process = Process(target=egm.start)
     server_process.start()
 
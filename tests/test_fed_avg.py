@@ -7,7 +7,9 @@ enough that the amount of requried testing infrastructure is not justified.
 """
 
 import io
+import copy
 import msgpack
+import pytest
 import torch
 
 from torch import nn
@@ -137,3 +139,51 @@ def test_fed_avg_server():
 
     assert_models_equal(
         fed_avg_server.global_model_trainer.model, test_global_model)
+
+
+def test_fed_avg_server_wire_dtype():
+
+    trainer = FedAvgTestTrainer()
+    fed_avg_server = FedAvgServer(trainer, key_list_file=None, wire_dtype='float16')
+
+    model_dict = fed_avg_server.return_global_model()
+    model_ret = torch.load(io.BytesIO(model_dict[GLOBAL_MODEL]))
+    for param in model_ret.parameters():
+        assert param.dtype == torch.float16
+
+    # the global model itself is left at full precision
+    for param in trainer.model.parameters():
+        assert param.dtype == torch.float32
+
+    # workers load the half precision parameters back into a float32 model
+    worker_model = FedAvgTestModel()
+    worker_model.load_state_dict(model_ret.state_dict())
+    for param_1, param_2 in zip(worker_model.parameters(), trainer.model.parameters()):
+        assert param_1.dtype == torch.float32
+        assert torch.allclose(param_1.data, param_2.data, atol=1e-2)
+
+    # parameters can only be sent as floating point types
+    for wire_dtype in ['int8', 'bool', 'nn', 'not_a_dtype']:
+        with pytest.raises(ValueError):
+            FedAvgServer(trainer, key_list_file=None, wire_dtype=wire_dtype)
+
+
+def test_fed_avg_server_half_precision_updates():
+
+    trainer = FedAvgTestTrainer()
+    fed_avg_server = FedAvgServer(trainer, key_list_file=None, update_lim=2)
+
+    # workers sending updates with wire_dtype='float16'
+    worker_models = [FedAvgTestModel(), FedAvgTestModel()]
+    for i, worker_model in enumerate(worker_models):
+        worker_id = f"dummy_worker_id_{i}"
+        fed_avg_server.worker_updates[worker_id] = None
+        model_update = io.BytesIO()
+        torch.save(copy.deepcopy(worker_model).half(), model_update)
+        fed_avg_server.receive_worker_update(worker_id, msgpack.packb((10, model_update.getvalue())))
+
+    sd_1 = worker_models[0].state_dict()
+    sd_2 = worker_models[1].state_dict()
+    for key, value in fed_avg_server.global_model_trainer.model.state_dict().items():
+        assert value.dtype == torch.float32
+        assert torch.allclose(value, (sd_1[key] + sd_2[key]) / 2, atol=1e-2)
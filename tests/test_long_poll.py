@@ -4,12 +4,13 @@ Test long polling.
 
 import os
 import msgpack
+import requests
 from datetime import datetime
 
 from nacl.encoding import HexEncoder
 from gevent import Greenlet, sleep
 
-from dc_federated.backend import DCFServer, DCFWorker, create_model_dict
+from dc_federated.backend import DCFServer, DCFWorker, create_model_dict, is_valid_model_dict
 from dc_federated.backend._constants import *
 from dc_federated.backend.worker_key_pair_tool import gen_pair
 from dc_federated.utils import StoppableServer, get_host_ip
@@ -155,6 +156,7 @@ def test_long_polling():
 
     sleep(halt_time)
     global_model_version = "2"
+    dcf_server.notify_new_global_model()
 
     start_time = datetime.now()
     # if it hasn't stopped after 100 seconds, it has failed.
@@ -170,3 +172,67 @@ def test_long_polling():
 
     for f in os.listdir(keys_folder):
         os.remove(os.path.join(keys_folder, f))
+
+
+def test_long_polling_server_busy():
+    global_model_version = "1"
+
+    def test_ret_global_model_cb():
+        return create_model_dict(
+            msgpack.packb("Pickle dump of a string"),
+            global_model_version)
+
+    def is_global_model_most_recent(version):
+        return version == global_model_version
+
+    dcf_server = DCFServer(
+        register_worker_callback=lambda worker_id: None,
+        unregister_worker_callback=lambda worker_id: None,
+        return_global_model_callback=test_ret_global_model_cb,
+        is_global_model_most_recent=is_global_model_most_recent,
+        receive_worker_update_callback=lambda worker_id, update: None,
+        server_mode_safe=False,
+        key_list_file=None,
+        model_check_interval=1,
+        max_greenlets=1,
+        load_last_session_workers=False
+    )
+
+    stoppable_server = StoppableServer(host=get_host_ip(), port=8080)
+
+    def begin_server():
+        dcf_server.start_server(stoppable_server)
+    server_gl = Greenlet.spawn(begin_server)
+    sleep(2)
+
+    worker = SimpleLPWorker(dcf_server.server_host_ip, dcf_server.server_port, None)
+    worker.worker.register_worker()
+    busy_worker = worker.worker
+
+    # take the only place in the pool of long polling requests.
+    blocking_gl = dcf_server.gevent_pool.spawn(sleep, 60)
+
+    challenge_phrase = requests.get(
+        f"http://{dcf_server.server_host_ip}:{dcf_server.server_port}/"
+        f"{CHALLENGE_PHRASE_ROUTE}/{busy_worker.worker_id}").content
+    response = requests.post(
+        f"http://{dcf_server.server_host_ip}:{dcf_server.server_port}/{NOTIFY_ME_IF_GM_VERSION_UPDATED_ROUTE}",
+        json={WORKER_ID_KEY: busy_worker.worker_id,
+              LAST_WORKER_MODEL_VERSION: "0",
+              SIGNED_PHRASE: busy_worker.get_signed_phrase(challenge_phrase)})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(SERVER_BUSY_RETRY_AFTER)
+    assert response.content == SERVER_BUSY.encode()
+
+    # the worker waits before returning, rather than polling again straight away
+    start_time = datetime.now()
+    assert busy_worker.get_global_model() == SERVER_BUSY.encode()
+    assert (datetime.now() - start_time).total_seconds() >= SERVER_BUSY_RETRY_AFTER
+
+    # once there is room in the pool the request is served again
+    blocking_gl.kill()
+    model_dict = busy_worker.get_global_model()
+    assert is_valid_model_dict(model_dict)
+    assert model_dict[GLOBAL_MODEL_VERSION] == global_model_version
+
+    stoppable_server.shutdown()
@@ -0,0 +1,149 @@
+"""
+Test the WorkerManager class directly, without starting a server.
+"""
+
+import json
+
+from nacl.encoding import HexEncoder
+from nacl.signing import SigningKey
+
+from dc_federated.backend._constants import INVALID_WORKER, PUBLIC_KEY_STR, WORKER_ID_KEY, \
+    REGISTRATION_STATUS_KEY, AUTHENTICATED, UNREGISTERED_WORKER
+from dc_federated.backend._worker_manager import WorkerManager
+
+
+def gen_key_pair():
+    private_key = SigningKey.generate()
+    return private_key, private_key.verify_key.encode(encoder=HexEncoder).decode('utf-8')
+
+
+def test_verified_signature_cache():
+    private_key, public_key_str = gen_key_pair()
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=False)
+    worker_manager.add_worker(public_key_str)
+
+    signed_phrase = private_key.sign(b'test phrase').hex()
+    assert worker_manager.authenticate_worker(public_key_str, signed_phrase, b'test phrase')
+    assert len(worker_manager.verified_signatures) == 1
+
+    # cached signatures must still be checked against the expected message
+    assert worker_manager.authenticate_worker(public_key_str, signed_phrase, b'test phrase')
+    assert not worker_manager.authenticate_worker(public_key_str, signed_phrase, b'other phrase')
+
+    # bad signatures are never cached
+    bad_signed_phrase = SigningKey.generate().sign(b'test phrase').hex()
+    assert not worker_manager.authenticate_worker(public_key_str, bad_signed_phrase)
+    assert len(worker_manager.verified_signatures) == 1
+
+    # removing the worker invalidates its cached signatures
+    worker_manager.remove_worker(public_key_str)
+    assert len(worker_manager.verified_signatures) == 0
+    assert not worker_manager.authenticate_worker(public_key_str, signed_phrase, b'test phrase')
+
+
+def test_invalid_public_keys():
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=False)
+    _, public_key_str = gen_key_pair()
+    for invalid_key in [public_key_str[:-2], public_key_str + 'ab', 'x' + public_key_str[1:], '']:
+        assert worker_manager.add_worker(invalid_key) == (INVALID_WORKER, False)
+    assert len(worker_manager.public_keys) == 0
+    assert worker_manager.add_worker(public_key_str) == (public_key_str, True)
+
+
+def test_worker_list():
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=False)
+    public_key_strs = [gen_key_pair()[1] for _ in range(2)]
+    worker_manager.add_worker(public_key_strs[0])
+    assert worker_manager.get_worker_list() == [
+        {WORKER_ID_KEY: public_key_strs[0], REGISTRATION_STATUS_KEY: False}]
+
+    worker_manager.add_worker(public_key_strs[1])
+    worker_manager.set_registration_status(public_key_strs[1], True)
+    assert worker_manager.get_worker_list() == [
+        {WORKER_ID_KEY: public_key_strs[0], REGISTRATION_STATUS_KEY: False},
+        {WORKER_ID_KEY: public_key_strs[1], REGISTRATION_STATUS_KEY: True}]
+    assert worker_manager.get_worker_list() is worker_manager.get_worker_list()
+
+
+def test_legacy_keys_db_migration(tmp_path):
+    path_to_keys_db = str(tmp_path / 'legacy_workers_db.json')
+    public_key_strs = [gen_key_pair()[1] for _ in range(3)]
+    with open(path_to_keys_db, 'w') as f:
+        json.dump({'_default': {str(n + 1): {PUBLIC_KEY_STR: pk}
+                                for n, pk in enumerate(public_key_strs)}}, f)
+
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=True,
+                                   path_to_keys_db=path_to_keys_db)
+    assert worker_manager.allowed_workers == set(public_key_strs)
+    assert sorted(pk for pk, in worker_manager.public_keys_db.execute("SELECT pk FROM keys")) == \
+        sorted(public_key_strs)
+    worker_manager.public_keys_db.close()
+
+    with open(path_to_keys_db + '.bak', 'r') as f:
+        assert len(json.load(f)['_default']) == 3
+
+    # the migrated database is loaded as sqlite on the next start
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=True,
+                                   path_to_keys_db=path_to_keys_db)
+    assert worker_manager.allowed_workers == set(public_key_strs)
+    worker_manager.public_keys_db.close()
+
+
+def test_registration_status_persistence(tmp_path):
+    path_to_keys_db = str(tmp_path / 'status_workers_db.sqlite')
+    public_key_strs = [gen_key_pair()[1] for _ in range(3)]
+
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=True,
+                                   path_to_keys_db=path_to_keys_db)
+    for public_key_str in public_key_strs:
+        worker_manager.add_worker(public_key_str)
+    worker_manager.set_registration_status(public_key_strs[0], True)
+    worker_manager.set_registration_status(public_key_strs[1], True)
+    worker_manager.set_registration_status(public_key_strs[1], False)
+    worker_manager.public_keys_db.close()
+
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=True,
+                                   path_to_keys_db=path_to_keys_db)
+    assert worker_manager.allowed_workers == set(public_key_strs)
+    assert worker_manager.is_worker_registered(public_key_strs[0])
+    assert not worker_manager.is_worker_registered(public_key_strs[1])
+    assert not worker_manager.is_worker_registered(public_key_strs[2])
+    worker_manager.public_keys_db.close()
+
+
+def test_check_polling_auth():
+    private_key, public_key_str = gen_key_pair()
+    worker_manager = WorkerManager(server_mode_safe=True,
+                                   key_list_file=None,
+                                   load_last_session_workers=False)
+
+    def signed_challenge():
+        challenge_phrase = worker_manager.get_challenge_phrase(public_key_str)
+        return private_key.sign(challenge_phrase.encode()).hex()
+
+    assert worker_manager.check_polling_auth(public_key_str, 'ab') == INVALID_WORKER
+
+    worker_manager.add_worker(public_key_str)
+    assert worker_manager.check_polling_auth(public_key_str, signed_challenge()) == UNREGISTERED_WORKER
+
+    worker_manager.set_registration_status(public_key_str, True)
+    assert worker_manager.check_polling_auth(public_key_str, signed_challenge()) == AUTHENTICATED
+
+    # each challenge phrase can only be used once
+    signed = signed_challenge()
+    assert worker_manager.check_polling_auth(public_key_str, signed) == AUTHENTICATED
+    assert worker_manager.check_polling_auth(public_key_str, signed) == INVALID_WORKER
@@ -7,7 +7,6 @@ import zlib
 import msgpack
 import json
 import hashlib
-from tinydb import Query
 
 from nacl.exceptions import BadSignatureError
 from nacl.encoding import HexEncoder
@@ -31,7 +30,11 @@ logger = logging.getLogger(__file__)
 logger.setLevel(level=logging.INFO)
 
 
-def test_worker_persistence():
+def get_db_keys(server):
+    return [pk for pk, in server.worker_manager.public_keys_db.execute("SELECT pk FROM keys")]
+
+
+def test_worker_persistence(tmp_path):
     worker_ids = []
     added_workers = []
     worker_updates = {}
@@ -85,8 +88,7 @@ def test_worker_persistence():
     def get_signed_phrase(private_key, phrase=b'test phrase'):
         return SigningKey(private_key, encoder=HexEncoder).sign(phrase).hex()
 
-    if os.path.exists('workers_db.json'):
-        os.remove('workers_db.json')
+    path_to_keys_db = str(tmp_path / 'workers_db.json')
 
     server = DCFServer(
         register_worker_callback=test_register_func_cb,
@@ -96,7 +98,7 @@ def test_worker_persistence():
         receive_worker_update_callback=test_rec_server_update_cb,
         server_mode_safe=True,
         load_last_session_workers=True,
-        path_to_keys_db='workers_db.json',
+        path_to_keys_db=path_to_keys_db,
         key_list_file=worker_key_file)
 
     worker_updates = {}
@@ -106,7 +108,7 @@ def test_worker_persistence():
     server_gl = Greenlet.spawn(begin_server, server, stoppable_server)
     sleep(2)
 
-    assert len(server.worker_manager.public_keys_db) == 3
+    assert len(get_db_keys(server)) == 3
     # Register a set of workers using the admin API and test registration
     for i in range(num_pre_load_workers, num_workers):
 
@@ -124,10 +126,10 @@ def test_worker_persistence():
         assert worker_ids[idx] == added_worker_dict[WORKER_ID_KEY]
         added_workers.append(added_worker_dict[WORKER_ID_KEY])
 
-    assert len(server.worker_manager.public_keys_db) == 6
+    assert len(get_db_keys(server)) == 6
 
-    for doc in server.worker_manager.public_keys_db.all():
-        assert doc[PUBLIC_KEY_STR] in public_keys
+    for pk in get_db_keys(server):
+        assert pk in public_keys
 
     # Send updates and receive global updates for the registered workers
     # This should succeed
@@ -175,18 +177,21 @@ def test_worker_persistence():
         receive_worker_update_callback=test_rec_server_update_cb,
         server_mode_safe=True,
         load_last_session_workers=True,
-        path_to_keys_db='workers_db.json',
+        path_to_keys_db=path_to_keys_db,
         key_list_file=worker_key_file)
 
-    assert len(server.worker_manager.public_keys_db) == 6
+    assert len(get_db_keys(server)) == 6
     assert len(server.worker_manager.allowed_workers) == 6
-    for doc in server.worker_manager.public_keys_db.all():
-        assert doc[PUBLIC_KEY_STR] in server.worker_manager.allowed_workers
+    for pk in get_db_keys(server):
+        assert pk in server.worker_manager.allowed_workers
 
     stoppable_server = StoppableServer(host=get_host_ip(), port=8080)
     server_gl = Greenlet.spawn(begin_server, server, stoppable_server)
     sleep(2)
 
+    # workers registered in the previous session are registered again on start up
+    assert sorted(worker_ids) == sorted(added_workers)
+
     # Delete existing workers and check this works.
     for i in range(num_pre_load_workers):
         response = requests.delete(
@@ -196,10 +201,10 @@ def test_worker_persistence():
         assert SUCCESS_MESSAGE_KEY in message_dict
     assert len(worker_ids) == 0
 
-    assert len(server.worker_manager.public_keys_db) == 3
+    assert len(get_db_keys(server)) == 3
     assert len(server.worker_manager.allowed_workers) == 3
-    for doc in server.worker_manager.public_keys_db.all():
-        assert doc[PUBLIC_KEY_STR] in server.worker_manager.allowed_workers
+    for pk in get_db_keys(server):
+        assert pk in server.worker_manager.allowed_workers
 
     stoppable_server.shutdown()
 
@@ -208,6 +213,3 @@ def test_worker_persistence():
         os.remove(worker_key_file_prefix + f'_{n}')
         os.remove(worker_key_file_prefix + f'_{n}.pub')
     os.remove(worker_key_file)
-
-    os.remove('workers_db.json')
-    os.remove('workers_db.json.bak')